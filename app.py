@@ -2,6 +2,8 @@ import streamlit as st
 import time
 from datetime import datetime, timezone
 from main import IncidentResponseAgent
+from validation import format_diagnostics
+from incident_store import fingerprint_error, new_incident_id
 from elasticsearch import Elasticsearch
 import os
 
@@ -148,58 +150,85 @@ with col2:
             
             # --- START AGENT WORKFLOW ---
             with st.status("🤖 Agent at work...", expanded=True) as status:
-                st.write("🔹 Phase 1: Analyzing logic flow...")
+                store = st.session_state.agent.tools.incident_store
+                incident_id = new_incident_id()
+                fingerprint = fingerprint_error(st.session_state.current_error)
+                store.record_incident(incident_id, fingerprint, st.session_state.current_error)
+                store.record_retrieval(incident_id, fingerprint, st.session_state.context)
                 
-                prompt = f"""
-                You are a Senior SRE.
-                ERROR: {st.session_state.current_error}
-                FILE: {st.session_state.context['file_path']}
-                CODE: {st.session_state.context['content']}
-                """
+                # STEP 0: DEDUP - a recurring incident reuses its existing patch and ticket
+                previous = store.find_resolution(fingerprint)
+                reused = previous is not None
                 
-                # GET RESPONSE (Dict containing 'explanation' and 'code')
-                response_payload = st.session_state.agent.brain.think(prompt)
+                if reused:
+                    explanation = previous["patch"]["explanation"]
+                    final_code = previous["patch"]["code"]
+                    ticket = previous["ticket"]
+                    st.write(f"♻️ Recurring incident: reusing patch and ticket {ticket['id']}.")
+                    status.update(label="Known Incident Matched", state="complete", expanded=False)
+                else:
+                    st.write("🔹 Phase 1: Analyzing logic flow...")
                 
-                # UNPACK
-                explanation = response_payload["explanation"]
-                raw_fix = response_payload["code"]
+                    prompt = f"""
+                    You are a Senior SRE.
+                    ERROR: {st.session_state.current_error}
+                    FILE: {st.session_state.context['file_path']}
+                    CODE: {st.session_state.context['content']}
+                    """
                 
-                st.write("✅ Patch Generated.")
-                time.sleep(0.5)
+                    # GET RESPONSE (Dict containing 'explanation' and 'code')
+                    response_payload = st.session_state.agent.brain.think(prompt)
+                
+                    # UNPACK
+                    explanation = response_payload["explanation"]
+                    raw_fix = response_payload["code"]
+                
+                    st.write("✅ Patch Generated.")
+                    time.sleep(0.5)
 
-                # STEP 2: SELF-HEALING LOOP
-                st.write("🔹 Phase 2: Running safety diagnostics...")
+                    # STEP 2: SELF-HEALING LOOP
+                    st.write("🔹 Phase 2: Running safety diagnostics...")
+                
+                    attempt = 0
+                    max_retries = 3
+                    is_valid = False
+                    final_code = raw_fix
                 
-                attempt = 0
-                max_retries = 3
-                is_valid = False
-                final_code = raw_fix
+                    file_path = st.session_state.context['file_path']
                 
-                while attempt < max_retries:
-                    is_valid, message = st.session_state.agent.tools.check_syntax(final_code)
-                    if is_valid:
-                        st.write(message)
-                        break 
-                    else:
-                        st.warning(f"⚠️ Attempt {attempt+1}: Syntax Error. Self-correcting...")
-                        # In Mock mode, 'think' returns the dict again, so we extract code
-                        new_response = st.session_state.agent.brain.think("syntax error fix")
-                        final_code = new_response["code"]
-                        attempt += 1
-
-                if not is_valid:
-                    st.error("❌ Critical: Auto-repair failed.")
-                    st.stop()
-
-                # STEP 3: ACT
-                st.write("🔹 Phase 3: Drafting Incident Ticket...")
-                ticket = st.session_state.agent.tools.draft_jira_ticket(
-                    st.session_state.current_error,
-                    st.session_state.context['file_path'],
-                    final_code
-                )
-                st.write(f"✅ Ticket {ticket['id']} Created.")
-                status.update(label="Workflow Complete", state="complete", expanded=False)
+                    while attempt < max_retries:
+                        verdict = st.session_state.agent.tools.validate_patch(final_code, file_path)
+                        is_valid = verdict["valid"]
+                        if is_valid:
+                            st.write(verdict["message"])
+                            break 
+                        else:
+                            st.warning(f"⚠️ Attempt {attempt+1}: {verdict['message']}. Self-correcting...")
+                            # Feed the structured diagnostics back so the model knows where it broke
+                            # In Mock mode, 'think' returns the dict again, so we extract code
+                            new_response = st.session_state.agent.brain.think(
+                                f"Fix this syntax error in {file_path}:\n{format_diagnostics(verdict)}\n\nCODE:\n{final_code}"
+                            )
+                            final_code = new_response["code"]
+                            attempt += 1
+
+                    if not is_valid:
+                        st.error("❌ Critical: Auto-repair failed.")
+                        st.stop()
+
+                    # STEP 3: ACT
+                    st.write("🔹 Phase 3: Drafting Incident Ticket...")
+                    ticket = st.session_state.agent.tools.draft_jira_ticket(
+                        st.session_state.current_error,
+                        st.session_state.context['file_path'],
+                        final_code
+                    )
+                    st.write(f"✅ Ticket {ticket['id']} Created.")
+                    
+                    # Queued for the background writer, never waits on Elasticsearch
+                    store.record_patch(incident_id, fingerprint, file_path, final_code, explanation)
+                    store.record_ticket(incident_id, fingerprint, ticket)
+                    status.update(label="Workflow Complete", state="complete", expanded=False)
 
             # --- FINAL OUTPUT DISPLAY ---
             st.success("Candidate Fix Ready for Review")
@@ -211,4 +240,5 @@ with col2:
             st.code(final_code, language="python")
             
             # 3. DISPLAY THE TICKET
-            st.info(f"🔗 **Jira Ticket Created:** [{ticket['id']}: {ticket['title']}](https://jira.atlassian.com) \n\nStatus: `{ticket['status']}`")
\ No newline at end of file
+            ticket_label = "Existing Jira Ticket" if reused else "Jira Ticket Created"
+            st.info(f"🔗 **{ticket_label}:** [{ticket['id']}: {ticket['title']}](https://jira.atlassian.com) \n\nStatus: `{ticket['status']}`")
\ No newline at end of file
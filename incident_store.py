@@ -0,0 +1,283 @@
+import atexit
+import hashlib
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from elasticsearch import helpers
+
+# --- CONFIGURATION ---
+INDEX_NAME = "sre-incidents"
+FLUSH_SIZE = 50           # records per bulk request
+FLUSH_INTERVAL = 5.0      # seconds before a partial batch is flushed anyway
+MAX_PENDING = 10000       # queue bound; beyond this records are dropped, never blocked on
+LOOKUP_TIMEOUT = 2        # seconds the remediation path will wait on a dedup lookup
+FLUSH_RETRIES = 3         # extra attempts for a failed bulk write before it is dropped
+RESOLUTION_CACHE_SIZE = 1024  # fingerprints whose patch/ticket are kept in memory
+RETRY_BACKOFF = 1.0       # seconds, doubled per attempt (1 + 2 + 4 fits in close()'s timeout)
+
+# Kinds that are written once per fingerprint and reused when the incident recurs
+DEDUP_KINDS = ("patch", "ticket")
+
+MAPPING = {
+    "properties": {
+        "@timestamp": {"type": "date"},
+        "kind": {"type": "keyword"},
+        "fingerprint": {"type": "keyword"},
+        "incident_id": {"type": "keyword"},
+        # Stored for reuse, not searched
+        "payload": {"type": "object", "enabled": False},
+    }
+}
+
+# Only tokens that change between occurrences of the same bug are masked; status
+# codes, identifiers and module names stay, since they tell different bugs apart
+_TIMESTAMP = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+_UUID = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")
+_HEX = re.compile(r"\b0x[0-9a-fA-F]+\b")
+_LINE = re.compile(r"\bline \d+", re.IGNORECASE)
+# "routes.js:15:7" / "main.go:42" style locations in JS, Go and Java traces
+# (source extensions only, so "db.internal:5432" keeps its port)
+_FILE_LINE = re.compile(r"(\.(?:py|js|jsx|mjs|cjs|ts|tsx|java|go)):\d+(?::\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint_error(error_msg):
+    """
+    Stable hash of an error with the volatile parts (line numbers, memory
+    addresses, timestamps, UUIDs, whitespace) masked, so the same crash maps
+    to the same id while errors differing in any other token stay distinct.
+    """
+    text = _TIMESTAMP.sub("<ts>", error_msg or "")
+    text = _UUID.sub("<uuid>", text)
+    text = _HEX.sub("0x?", text)
+    text = _LINE.sub("line #", text)
+    text = _FILE_LINE.sub(r"\1:#", text)
+    text = _SPACE.sub(" ", text).strip().lower()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def new_incident_id():
+    return uuid.uuid4().hex
+
+
+def new_ticket_id():
+    return f"SRE-{uuid.uuid4().hex[:12].upper()}"
+
+
+class IncidentStore:
+    """
+    Persists incident, retrieval, patch and ticket records to Elasticsearch.
+    Records are queued and bulk-flushed by a background thread on size/time
+    thresholds, so callers on the remediation path never wait on a write.
+    """
+    def __init__(self, client, index_name=INDEX_NAME, flush_size=FLUSH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 cache_size=RESOLUTION_CACHE_SIZE):
+        self.client = client
+        self.index_name = index_name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.dropped = 0
+        self._index_ready = False
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        # LRU of fingerprint -> {"patch": {...}, "ticket": {...}}; covers records not yet flushed
+        self._resolutions = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._run, name="incident-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # --- WRITES (never block) ---
+    def _enqueue(self, kind, fingerprint, incident_id, payload):
+        doc = {
+            "@timestamp": datetime.now(timezone.utc).isoformat(),
+            "kind": kind,
+            "fingerprint": fingerprint,
+            "incident_id": incident_id,
+            "payload": payload,
+        }
+        if kind in DEDUP_KINDS:
+            # Deterministic id + create: the first record for a fingerprint wins,
+            # replays and races are rejected by Elasticsearch as conflicts
+            action = {"_op_type": "create", "_id": f"{fingerprint}-{kind}"}
+        else:
+            action = {"_op_type": "index", "_id": uuid.uuid4().hex}
+        action.update({"_index": self.index_name, "_source": doc})
+        try:
+            self._queue.put_nowait(action)
+        except queue.Full:
+            self._count_dropped(1)
+
+    def _count_dropped(self, n):
+        with self._lock:
+            self.dropped += n
+
+    def record_incident(self, incident_id, fingerprint, error_msg):
+        self._enqueue("incident", fingerprint, incident_id, {"error": error_msg})
+
+    def record_retrieval(self, incident_id, fingerprint, context):
+        self._enqueue("retrieval", fingerprint, incident_id, {
+            "file_path": context.get("file_path"),
+            "content": context.get("content"),
+        })
+
+    def _remember(self, fingerprint, resolution):
+        # Caller holds self._lock. First record per kind wins, matching op_type=create.
+        entry = self._resolutions.setdefault(fingerprint, {})
+        for kind, payload in resolution.items():
+            entry.setdefault(kind, payload)
+        self._resolutions.move_to_end(fingerprint)
+        if len(self._resolutions) > self.cache_size:
+            self._resolutions.popitem(last=False)
+
+    def record_patch(self, incident_id, fingerprint, file_path, code, explanation):
+        payload = {"file_path": file_path, "code": code, "explanation": explanation}
+        with self._lock:
+            self._remember(fingerprint, {"patch": payload})
+        self._enqueue("patch", fingerprint, incident_id, payload)
+
+    def record_ticket(self, incident_id, fingerprint, ticket):
+        with self._lock:
+            self._remember(fingerprint, {"ticket": ticket})
+        self._enqueue("ticket", fingerprint, incident_id, ticket)
+
+    # --- READS ---
+    def find_resolution(self, fingerprint):
+        """
+        Returns {"patch": {...}, "ticket": {...}} for a fingerprint already
+        resolved, or None. Checks in-memory first, then a realtime mget that
+        gives up after LOOKUP_TIMEOUT rather than hold up the agent.
+        """
+        with self._lock:
+            cached = self._resolutions.get(fingerprint)
+            if cached and all(kind in cached for kind in DEDUP_KINDS):
+                self._resolutions.move_to_end(fingerprint)
+                return cached
+
+        try:
+            # max_retries=0: transport retries would multiply the wait when Elastic is down
+            response = self.client.options(request_timeout=LOOKUP_TIMEOUT, max_retries=0).mget(
+                index=self.index_name,
+                ids=[f"{fingerprint}-{kind}" for kind in DEDUP_KINDS],
+            )
+        except Exception as e:
+            print(f"⚠️ [Store] Dedup lookup skipped: {e}")
+            return None
+
+        found = {}
+        for doc in response["docs"]:
+            if doc.get("found"):
+                found[doc["_source"]["kind"]] = doc["_source"]["payload"]
+        if not all(kind in found for kind in DEDUP_KINDS):
+            return None
+
+        with self._lock:
+            self._remember(fingerprint, found)
+        return found
+
+    # --- BACKGROUND WRITER ---
+    def _ensure_index(self):
+        """Creates the index with MAPPING. Raises on failure so the flush is retried."""
+        if self._index_ready:
+            return
+        if not self.client.indices.exists(index=self.index_name):
+            self.client.options(ignore_status=400).indices.create(
+                index=self.index_name, mappings=MAPPING
+            )
+        self._index_ready = True
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        # Every action carries a fixed _id, so resending a whole batch is idempotent
+        for attempt in range(FLUSH_RETRIES + 1):
+            try:
+                # Never bulk into a missing index: Elasticsearch would auto-create it
+                # with dynamic mapping and lose the keyword/enabled=false settings
+                self._ensure_index()
+                # max_retries covers per-record 429s; the loop covers connection errors/timeouts
+                _, errors = helpers.bulk(
+                    self.client, batch, raise_on_error=False,
+                    max_retries=FLUSH_RETRIES, initial_backoff=RETRY_BACKOFF,
+                )
+                break
+            except Exception as e:
+                if attempt == FLUSH_RETRIES:
+                    print(f"⚠️ [Store] Dropping {len(batch)} records after {attempt + 1} attempts: {e}")
+                    self._count_dropped(len(batch))
+                    return
+                delay = RETRY_BACKOFF * 2 ** attempt
+                print(f"⚠️ [Store] Bulk write failed ({e}), retrying in {delay:.0f}s...")
+                time.sleep(delay)
+
+        # 409 on a create is a duplicate fingerprint, i.e. dedup doing its job
+        real_errors = [err for err in errors if next(iter(err.values())).get("status") != 409]
+        if real_errors:
+            print(f"⚠️ [Store] {len(real_errors)} records rejected: {real_errors[0]}")
+            self._count_dropped(len(real_errors))
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                action = self._queue.get(timeout=timeout)
+                if action is not None:  # None is the wake-up sent by close()
+                    batch.append(action)
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if len(batch) >= self.flush_size or time.monotonic() >= deadline or stopping:
+                if stopping:
+                    # Drain whatever is still queued before exiting
+                    while True:
+                        try:
+                            action = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if action is not None:
+                            batch.append(action)
+                for start in range(0, len(batch), self.flush_size):
+                    self._flush(batch[start:start + self.flush_size])
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                if stopping:
+                    return
+
+    def close(self, timeout=10):
+        """Flushes pending records and stops the writer."""
+        if self._writer.is_alive():
+            self._stop.set()
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass  # writer is busy draining and will see the stop flag
+            self._writer.join(timeout)
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_incident_store(client):
+    """
+    Process-wide IncidentStore, so every Streamlit session shares one writer
+    thread instead of starting its own. The first caller's client is used.
+    """
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = IncidentStore(client)
+        return _shared_store
@@ -1,10 +1,10 @@
 import os
 import requests
-import ast
-import time
 from dotenv import load_dotenv, find_dotenv
 from elasticsearch import Elasticsearch
 from sentence_transformers import SentenceTransformer
+from validation import get_validator
+from incident_store import get_incident_store, new_ticket_id
 
 # --- FORCE LOAD .ENV ---
 env_path = find_dotenv()
@@ -86,6 +86,10 @@ class ElasticTools:
         print("⏳ [Tools] Loading Local Embedding Model...")
         self.embed_model = SentenceTransformer('all-MiniLM-L6-v2') 
 
+        # Shared per process: one agent is built per Streamlit session
+        self.validator = get_validator()
+        self.incident_store = get_incident_store(self.client)
+
     def _get_embedding(self, text):
         return self.embed_model.encode(text).tolist()
 
@@ -127,19 +131,23 @@ class ElasticTools:
             return response['hits']['hits'][0]['_source']
         return None
 
-    def check_syntax(self, code_string):
-        """Tool 3: Safety Check - Verifies Python syntax"""
-        try:
-            ast.parse(code_string)
-            return True, "✅ Syntax Validated"
-        except SyntaxError as e:
-            return False, f"❌ Syntax Error: {e}"
+    def check_syntax(self, code_string, file_path="patch.py"):
+        """Tool 3: Safety Check - Verifies syntax for the patch's language"""
+        verdict = self.validator.validate(code_string, file_path)
+        return verdict["valid"], verdict["message"]
+
+    def validate_patch(self, code_string, file_path):
+        """Tool 3a: Validates one patch, returns the full verdict with diagnostics"""
+        return self.validator.validate(code_string, file_path)
+
+    def validate_patches(self, patches):
+        """Tool 3b: Validates [(code, file_path), ...] concurrently, returns full verdicts"""
+        return self.validator.validate_batch(patches)
 
     def draft_jira_ticket(self, error_msg, file_path, fix_code):
         """Tool 4: Action - Drafts an incident ticket"""
-        ticket_id = f"SRE-{int(time.time()) % 10000}"
         return {
-            "id": ticket_id,
+            "id": new_ticket_id(),
             "title": f"Fix TemplateNotFound in {os.path.basename(file_path)}",
             "description": f"Automated fix generated for error: {error_msg.split(':')[0]}",
             "status": "Ready for Review",
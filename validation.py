@@ -0,0 +1,348 @@
+import ast
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, timeouts still apply
+    resource = None
+
+# --- CONFIGURATION ---
+DEFAULT_TIMEOUT = 10      # seconds of wall clock per external checker
+DEFAULT_CPU_LIMIT = 10    # seconds of CPU per external checker
+CACHE_SIZE = 256          # verdicts kept in memory
+
+# Matches "file:12:5: message" (gofmt, javac, eslint-style) and "file(12,5): message" (tsc)
+_COLON_STYLE = re.compile(r"^(?P<file>[^\s:()]+):(?P<line>\d+)(?::(?P<col>\d+))?:\s*(?P<msg>.+)$")
+_PAREN_STYLE = re.compile(r"^(?P<file>[^\s()]+)\((?P<line>\d+),(?P<col>\d+)\):\s*(?P<msg>.+)$")
+# node --check prints "file:12" on its own line, then the source, then "SyntaxError: ..."
+_NODE_LOCATION = re.compile(r"^(?P<file>\S+):(?P<line>\d+)$")
+_NODE_ERROR = re.compile(r"^(?P<msg>\w*Error: .+)$")
+
+# Parse-only TypeScript check. tsc itself can't do this: even TS1xxx codes include
+# option-dependent errors (TS1343 import.meta, TS1378 top-level await), and the
+# rest need the real project. createSourceFile's parseDiagnostics are grammar only.
+# Run as `node -e SCRIPT <path to typescript.js> <file>`.
+_TS_PARSE_SCRIPT = r"""
+const ts = require(process.argv[1]);
+const file = process.argv[2];
+const source = require("fs").readFileSync(file, "utf8");
+const sf = ts.createSourceFile(file, source, ts.ScriptTarget.Latest, false, ts.ScriptKind.TS);
+for (const d of sf.parseDiagnostics) {
+  const pos = sf.getLineAndCharacterOfPosition(d.start);
+  const msg = ts.flattenDiagnosticMessageText(d.messageText, " ");
+  console.log(`${file}(${pos.line + 1},${pos.character + 1}): error TS${d.code}: ${msg}`);
+}
+process.exit(sf.parseDiagnostics.length ? 1 : 0);
+"""
+# javac has no parse-only mode, so keep only messages its parser emits and drop
+# resolution/attribution errors ("cannot find symbol", "package ... does not exist").
+_JAVAC_SYNTAX = re.compile(
+    r"error: (.* expected$|illegal start of |reached end of file while parsing|not a statement"
+    r"|unclosed |illegal character|illegal line end|empty character literal|malformed "
+    r"|'(else|catch|finally)' without |orphaned |illegal escape character|unterminated )"
+)
+
+
+def _diagnostic(line, column, message):
+    return {"line": line, "column": column, "message": message}
+
+
+def _verdict(valid, checker, diagnostics=None, skipped=False, timed_out=False):
+    diagnostics = diagnostics or []
+    if skipped:
+        message = f"⚠️ No {checker} checker installed, syntax not verified"
+    elif valid:
+        message = "✅ Syntax Validated"
+    else:
+        first = diagnostics[0] if diagnostics else _diagnostic(None, None, "unknown error")
+        message = f"❌ Syntax Error: {first['message']} (line {first['line']})"
+    return {
+        "valid": valid,
+        "checker": checker,
+        "message": message,
+        "diagnostics": diagnostics,
+        "skipped": skipped,
+        "timed_out": timed_out,
+    }
+
+
+def _copy_verdict(verdict):
+    # Cached verdicts are shared across sessions; callers get their own copy to mutate
+    return dict(verdict, diagnostics=[dict(d) for d in verdict["diagnostics"]])
+
+
+class PythonChecker:
+    """
+    In-process check: ast.parse for syntax, then compile() for errors the
+    parser lets through ('return' outside function, bad nonlocal, ...).
+    """
+    name = "python"
+
+    def check(self, code_string, file_path):
+        try:
+            tree = ast.parse(code_string, filename=file_path or "<patch>")
+            compile(tree, file_path or "<patch>", "exec")
+        except SyntaxError as e:
+            return _verdict(False, self.name, [_diagnostic(e.lineno, e.offset, e.msg)])
+        except ValueError as e:  # e.g. null bytes in source
+            return _verdict(False, self.name, [_diagnostic(None, None, str(e))])
+        except (RecursionError, MemoryError):
+            return _verdict(False, self.name, [
+                _diagnostic(None, None, "code is nested too deeply for the parser")
+            ])
+        return _verdict(True, self.name)
+
+
+class ExternalChecker:
+    """
+    Runs a compiler/linter in a subprocess against a temp copy of the patch.
+    `command` is a list where "{path}" and "{tmpdir}" are substituted.
+    """
+    def __init__(self, name, command, suffix, timeout=DEFAULT_TIMEOUT,
+                 cpu_limit=DEFAULT_CPU_LIMIT, memory_mb=None, filename=None, keep=None):
+        self.name = name
+        self.command = command
+        self.suffix = suffix
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        # Address-space cap; leave off for runtimes that reserve big heaps up front (Go, JVM, V8)
+        self.memory_mb = memory_mb
+        # javac insists the file name matches the public class, so allow pinning it
+        self.filename = filename
+        # Predicate on a diagnostic message; filters out non-syntax errors from full compilers
+        self.keep = keep
+
+    def is_available(self):
+        return shutil.which(self.command[0]) is not None
+
+    def build_argv(self, path, tmpdir):
+        return [part.format(path=path, tmpdir=tmpdir) for part in self.command]
+
+    def _limit_resources(self, pid):
+        # Applied from the parent with prlimit rather than preexec_fn, which can
+        # deadlock the child when forking from a multithreaded process (Streamlit)
+        if not hasattr(resource, "prlimit"):
+            return
+        try:
+            if self.cpu_limit:
+                resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_limit, self.cpu_limit))
+            if self.memory_mb:
+                limit = self.memory_mb * 1024 * 1024
+                resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        except (ProcessLookupError, PermissionError):
+            pass  # child already exited
+
+    def check(self, code_string, file_path):
+        if not self.is_available():
+            return _verdict(True, self.name, skipped=True)
+
+        with tempfile.TemporaryDirectory(prefix="sre-validate-") as tmpdir:
+            name = self.filename or os.path.basename(file_path) or f"patch{self.suffix}"
+            path = os.path.join(tmpdir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(code_string)
+
+            argv = self.build_argv(path, tmpdir)
+            with subprocess.Popen(
+                argv,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                cwd=tmpdir,
+            ) as proc:
+                if resource:
+                    self._limit_resources(proc.pid)
+                try:
+                    stdout, stderr = proc.communicate(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.communicate()
+                    return _verdict(False, self.name, [
+                        _diagnostic(None, None, f"{self.name} checker timed out after {self.timeout}s")
+                    ], timed_out=True)
+
+        if proc.returncode < 0:
+            # Killed by a signal, i.e. it hit the CPU/memory limit: a resource verdict, not a syntax one
+            return _verdict(False, self.name, [
+                _diagnostic(None, None, f"{self.name} checker killed by resource limit (signal {-proc.returncode})")
+            ], timed_out=True)
+
+        output = (stdout or "") + (stderr or "")
+        diagnostics = parse_diagnostics(output)
+        if self.keep and diagnostics:
+            diagnostics = [d for d in diagnostics if self.keep(d["message"])]
+            # The compiler only complained about things a lone file can't resolve
+            if not diagnostics:
+                return _verdict(True, self.name)
+        if proc.returncode == 0 and not diagnostics:
+            return _verdict(True, self.name)
+        if not diagnostics:
+            diagnostics = [_diagnostic(None, None, output.strip() or f"exit code {proc.returncode}")]
+        return _verdict(False, self.name, diagnostics)
+
+
+class TypeScriptChecker(ExternalChecker):
+    """
+    Parses the patch with the typescript package that ships with tsc, so
+    unresolved imports and compiler-option errors don't fail a valid file.
+    """
+    def __init__(self, **kwargs):
+        super().__init__("typescript", ["node", "-e", _TS_PARSE_SCRIPT], ".ts", **kwargs)
+
+    def _typescript_lib(self):
+        # npm installs bin/tsc next to lib/typescript.js; the PATH entry is a symlink to it
+        tsc = shutil.which("tsc")
+        if not tsc:
+            return None
+        lib = os.path.join(os.path.dirname(os.path.realpath(tsc)), os.pardir, "lib", "typescript.js")
+        lib = os.path.normpath(lib)
+        return lib if os.path.exists(lib) else None
+
+    def is_available(self):
+        return shutil.which("node") is not None and self._typescript_lib() is not None
+
+    def build_argv(self, path, tmpdir):
+        # The script is full of braces, so it is passed as-is rather than through str.format
+        return ["node", "-e", _TS_PARSE_SCRIPT, self._typescript_lib(), path]
+
+
+def parse_diagnostics(output):
+    """Turns raw checker output into [{line, column, message}, ...]."""
+    diagnostics = []
+    node_line = None
+    for raw in output.splitlines():
+        line = raw.strip()
+        match = _PAREN_STYLE.match(line) or _COLON_STYLE.match(line)
+        if match:
+            col = match.group("col")
+            diagnostics.append(_diagnostic(
+                int(match.group("line")), int(col) if col else None, match.group("msg")
+            ))
+            continue
+        match = _NODE_LOCATION.match(line)
+        if match:
+            node_line = int(match.group("line"))
+            continue
+        match = _NODE_ERROR.match(line)
+        if match and node_line is not None:
+            diagnostics.append(_diagnostic(node_line, None, match.group("msg")))
+            node_line = None
+    return diagnostics
+
+
+# Extension -> checker. Matches the file types ingest.py indexes.
+CHECKERS = {
+    ".py": PythonChecker(),
+    ".js": ExternalChecker("javascript", ["node", "--check", "{path}"], ".js"),
+    ".ts": TypeScriptChecker(),
+    ".java": ExternalChecker(
+        "java", ["javac", "-proc:none", "-d", "{tmpdir}", "{path}"], ".java", timeout=30, cpu_limit=30,
+        keep=_JAVAC_SYNTAX.search,
+    ),
+    ".go": ExternalChecker("go", ["gofmt", "-e", "-l", "{path}"], ".go"),
+}
+
+
+def register_checker(extension, checker):
+    """Plug in (or override) the checker for a file extension, e.g. '.rs'."""
+    CHECKERS[extension.lower()] = checker
+
+
+def format_diagnostics(verdict):
+    """Renders a verdict as plain text the retry loop can hand back to the model."""
+    if verdict["valid"]:
+        return verdict["message"]
+    lines = [f"{verdict['checker']} syntax error(s):"]
+    for d in verdict["diagnostics"]:
+        where = f"line {d['line']}" if d["line"] is not None else "unknown line"
+        if d["column"] is not None:
+            where += f", column {d['column']}"
+        lines.append(f"- {where}: {d['message']}")
+    return "\n".join(lines)
+
+
+class PatchValidator:
+    """
+    Validates candidate patches by file type on a worker pool and caches
+    verdicts by content hash, so re-checking an unchanged patch is free.
+    """
+    def __init__(self, max_workers=4, cache_size=CACHE_SIZE):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="validator")
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _checker_for(self, file_path):
+        ext = os.path.splitext(file_path or "")[1].lower()
+        return CHECKERS.get(ext) if ext else None
+
+    def _cache_key(self, checker_name, code_string, file_path):
+        # The file name is part of the verdict (javac ties it to the public class)
+        digest = hashlib.sha256(code_string.encode("utf-8", "surrogatepass")).hexdigest()
+        return f"{checker_name}:{os.path.basename(file_path or '')}:{digest}"
+
+    def _run(self, code_string, file_path):
+        checker = self._checker_for(file_path)
+        if checker is None:
+            # Dockerfile, Makefile, .jsx, ...: nothing to check against, so don't fail it
+            label = os.path.splitext(file_path or "")[1] or os.path.basename(file_path or "") or "unknown"
+            return _verdict(True, label, skipped=True)
+
+        key = self._cache_key(checker.name, code_string, file_path)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return _copy_verdict(self._cache[key])
+
+        verdict = checker.check(code_string, file_path)
+
+        # Skips and timeouts are not cached: the tool may get installed while the
+        # app runs, and a slow run under load says nothing about the content
+        if not (verdict["skipped"] or verdict["timed_out"]):
+            with self._lock:
+                self._cache[key] = verdict
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return _copy_verdict(verdict)
+
+    def validate(self, code_string, file_path="patch.py"):
+        """
+        Validates one patch inline on the calling thread. A lone check gains
+        nothing from the pool and would queue behind other sessions' batches.
+        """
+        return self._run(code_string, file_path)
+
+    def validate_batch(self, patches):
+        """
+        Validates [(code_string, file_path), ...] concurrently.
+        Returns verdicts in the same order as the input.
+        """
+        futures = [self.pool.submit(self._run, code, path) for code, path in patches]
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+_shared_validator = None
+_shared_lock = threading.Lock()
+
+
+def get_validator():
+    """
+    Process-wide PatchValidator. Streamlit builds an agent per browser session,
+    so sharing one pool (and its cache) keeps threads from piling up.
+    """
+    global _shared_validator
+    with _shared_lock:
+        if _shared_validator is None:
+            _shared_validator = PatchValidator()
+        return _shared_validator